@@ -1338,7 +1338,7 @@ async def import_xprv(_1, _2, item):
 
         with CardSlot(readonly=True, **choice) as card:
             with open(fn, 'rt') as fd:
-                for ln in fd.readlines():
+                for ln in fd:
                     if 'prv' in ln:
                         extended_key = ln
                         break
@@ -1805,9 +1805,13 @@ async def sign_message_on_sd(*a):
         if '-signed' in filename.lower():
             return False
         with open(filename, 'rt') as fd:
-            lines = fd.readlines()
-            # min 1 line max 3 lines
-            return 1 <= len(lines) <= 3
+            # min 1 line max 3 lines; stop reading once too many
+            count = 0
+            for _ in fd:
+                count += 1
+                if count > 3:
+                    return False
+            return count >= 1
 
     fn = await file_picker(suffix='txt', min_size=2, max_size=500, taster=is_signable,
                            none_msg=('Must be one line of text, optionally '
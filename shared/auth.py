@@ -275,11 +275,15 @@ def write_sig_file(content_list, derive=None, addr_fmt=AF_CLASSIC, pk=None, sig_
     sig_gen = sign_export_contents([(h, f.split("/")[-1]) for h, f in content_list],
                                    derive, addr_fmt, pk=pk)
 
+    # small file: collect the parts, so one write to the card
+    parts = []
+    for i, part in enumerate(sig_gen):
+        parts.append(part)
+        # rfc template generator has length of 6
+        dis.progress_bar_show(i / 6)
+
     with open(sig_fpath, 'wt') as fd:
-        for i, part in enumerate(sig_gen):
-            fd.write(part)
-            # rfc template generator has length of 6
-            dis.progress_bar_show(i / 6)
+        fd.write(''.join(parts))
     return sig_nice
 
 def validate_text_for_signing(text):
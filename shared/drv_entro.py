@@ -230,10 +230,9 @@ async def drv_entro_step2(_1, picked, _2, just_pick=False):
                 with CardSlot(**choice) as card:
                     fname, out_fn = card.pick_filename('drv-%s-idx%d.txt' % (s_mode, index))
                     body = msg + "\n"
-                    with open(fname, 'wt') as fp:
-                        chunk_writer(fp, body)
+                    with open(fname, 'wb') as fp:
+                        h = chunk_writer(fp, body)
 
-                    h = ngu.hash.sha256s(body.encode())
                     sig_nice = write_sig_file([(h, fname)], derive=path)
 
             except CardMissingError:
@@ -2,10 +2,10 @@
 #
 # export.py - Export and share various semi-public data
 #
-import stash, chains, version, ujson, ngu
+import stash, chains, version, ujson, uos
 from uio import StringIO
 from ucollections import OrderedDict
-from utils import xfp2str, swab32, chunk_writer
+from utils import xfp2str, swab32, chunk_writer, BlockWriter
 from ux import ux_show_story
 from glob import settings
 from auth import write_sig_file
@@ -38,10 +38,14 @@ def generate_public_contents():
     #   key = value
     # or #comments
     # but value is JSON
+    # - shows progress bar as it goes, caller provides the screen
+    from glob import dis
 
     num_rx = 5
 
     chain = chains.current_chain()
+    ct = chain.b44_cointype
+    ct_s = str(ct)
 
     with stash.SensitiveValues() as sv:
 
@@ -70,12 +74,13 @@ be needed for different systems.
 
 
 '''.format(nb=chain.name, xpub=chain.serialize_public(sv.node), 
-            sym=chain.ctype, ct=chain.b44_cointype, xfp=xfp))
+            sym=chain.ctype, ct=ct, xfp=xfp))
 
-        for name, path, addr_fmt in chains.CommonDerivations:
+        for n, (name, path, addr_fmt) in enumerate(chains.CommonDerivations):
+            dis.progress_bar_show(n / len(chains.CommonDerivations))
 
             if '{coin_type}' in path:
-                path = path.replace('{coin_type}', str(chain.b44_cointype))
+                path = path.replace('{coin_type}', ct_s)
 
             if '{' in name:
                 name = name.format(core_name=chain.core_name)
@@ -85,39 +90,36 @@ be needed for different systems.
             yield ('''## For {name}: {path}\n\n'''.format(name=name, path=path))
             yield ('''First %d receive addresses (account=0, change=0):\n\n''' % num_rx)
 
-            submaster = None
-            for i in range(num_rx):
-                subpath = path.format(account=0, change=0, idx=i)
-
-                # find the prefix of the path that is hardneded
-                if "h" in subpath:
-                    hard_sub = subpath.rsplit("h", 1)[0] + "h"
-                else:
-                    hard_sub = 'm'
-
-                if hard_sub != submaster:
-                    # dump the xpub needed
+            # only the index varies below; split the path template around it once
+            head, _, tail = path.format(account=0, change=0, idx='{idx}').partition('{idx}')
 
-                    if submaster:
-                        yield "\n"
+            # find the prefix of the path that is hardneded
+            if "h" in head:
+                hard_sub = head.rsplit("h", 1)[0] + "h"
+            else:
+                hard_sub = 'm'
 
-                    node = sv.derive_path(hard_sub, register=False)
-                    yield ("%s => %s\n" % (hard_sub, chain.serialize_public(node)))
-                    if show_slip132 and addr_fmt != AF_CLASSIC and (addr_fmt in chain.slip132):
-                        yield ("%s => %s   ##SLIP-132##\n" % (
-                                    hard_sub, chain.serialize_public(node, addr_fmt)))
+            # dump the xpub needed
+            # - keep this node: only the non-hardened tail varies per address
+            prefix = sv.derive_path(hard_sub, register=False)
+            yield ("%s => %s\n" % (hard_sub, chain.serialize_public(prefix)))
+            if show_slip132 and addr_fmt != AF_CLASSIC and (addr_fmt in chain.slip132):
+                yield ("%s => %s   ##SLIP-132##\n" % (
+                            hard_sub, chain.serialize_public(prefix, addr_fmt)))
 
-                    submaster = hard_sub
-                    node.blank()
-                    del node
+            for i in range(num_rx):
+                subpath = head + str(i) + tail
 
                 # show the payment address
-                node = sv.derive_path(subpath, register=False)
+                node = sv.derive_path(subpath[len(hard_sub):], master=prefix, register=False)
                 yield ('%s => %s\n' % (subpath, chain.address(node, addr_fmt)))
 
                 node.blank()
                 del node
 
+            prefix.blank()
+            del prefix
+
             yield ('\n\n')
 
     from multisig import MultisigWallet
@@ -133,8 +135,28 @@ be needed for different systems.
             yield fp.getvalue()
             del fp
 
+    dis.progress_bar_show(1)
+
+def stream_parts(fd, body):
+    # write parts from generator into fd (a BlockWriter)
+    # - returns exception if generator failed, rather than the write
+    # - generator always closed, even if write fails, so its context
+    #   managers run (ie. SensitiveValues wipe)
+    try:
+        while 1:
+            try:
+                part = next(body)
+            except StopIteration:
+                return None
+            except Exception as e:
+                return e
+            fd.write(part.encode() if isinstance(part, str) else part)
+    finally:
+        body.close()
+
 async def write_text_file(fname_pattern, body, title, derive, addr_fmt):
     # Export data as a text file.
+    # - body can be text/bytes, or a generator of text/bytes parts
     from glob import dis, NFC
     from files import CardSlot, CardMissingError, needs_microsd
     from ux import import_export_prompt
@@ -143,7 +165,20 @@ async def write_text_file(fname_pattern, body, title, derive, addr_fmt):
                                         no_qr=(not version.has_qwerty))
     if choice == KEY_CANCEL:
         return
-    elif choice == KEY_QR:
+
+    is_gen = not isinstance(body, (str, bytes))
+    if is_gen:
+        # contents are made as we go, from here on
+        dis.fullscreen('Generating...')
+
+    if choice in (KEY_QR, KEY_NFC) and not isinstance(body, str):
+        # need it all in memory, as text, for these
+        if isinstance(body, bytes):
+            body = body.decode()
+        else:
+            body = "".join(p if isinstance(p, str) else p.decode() for p in body)
+
+    if choice == KEY_QR:
         await export_by_qr(body, title)
         return
     elif choice == KEY_NFC:
@@ -151,17 +186,31 @@ async def write_text_file(fname_pattern, body, title, derive, addr_fmt):
         return
 
     # choose a filename
+    gen_err = None
     try:
-        dis.fullscreen("Saving...")
+        if not is_gen:
+            dis.fullscreen("Saving...")
         with CardSlot(**choice) as card:
             fname, nice = card.pick_filename(fname_pattern)
 
             # do actual write
-            with open(fname, 'wb') as fd:
-                chunk_writer(fd, body)
+            if not is_gen:
+                with open(fname, 'wb') as fd:
+                    h = chunk_writer(fd, body)
+            else:
+                # stream generator output to file, in whole blocks, hashing as we go
+                # - generator shows the progress bar
+                with BlockWriter(open(fname, 'wb')) as fd:
+                    gen_err = stream_parts(fd, body)
+
+                if gen_err:
+                    # don't leave a truncated file behind
+                    uos.remove(fname)
+                else:
+                    h = fd.checksum.digest()
 
-            h = ngu.hash.sha256s(body.encode())
-            sig_nice = write_sig_file([(h, fname)], derive, addr_fmt)
+            if not gen_err:
+                sig_nice = write_sig_file([(h, fname)], derive, addr_fmt)
 
     except CardMissingError:
         await needs_microsd()
@@ -170,18 +219,18 @@ async def write_text_file(fname_pattern, body, title, derive, addr_fmt):
         await ux_show_story('Failed to write!\n\n\n'+str(e))
         return
 
+    if gen_err:
+        await ux_show_story('Failed to generate %s file!\n\n\n%s' % (title, gen_err))
+        return
+
     msg = '%s file written:\n\n%s\n\n%s signature file written:\n\n%s' % (title, nice, title,
                                                                           sig_nice)
     await ux_show_story(msg)
 
 async def make_summary_file(fname_pattern='public.txt'):
-    from glob import dis
-
     # record **public** values and helpful data into a text file
-    dis.fullscreen('Generating...')
-
-    # generator function:
-    body = "".join(list(generate_public_contents()))
+    # generator function: streamed out by write_text_file, which shows "Generating..."
+    body = generate_public_contents()
     ch = chains.current_chain()
     await write_text_file(fname_pattern, body, 'Summary',
                           "m/44h/%dh/0h/0/0" % ch.b44_cointype,
@@ -190,17 +239,19 @@ async def make_summary_file(fname_pattern='public.txt'):
 async def make_bitcoin_core_wallet(account_num=0, fname_pattern='bitcoin-core.txt'):
     from glob import dis
     xfp = xfp2str(settings.get('xfp'))
+    ch = chains.current_chain()
 
     dis.fullscreen('Generating...')
 
     # make the data
-    examples = []
+    examples = [None] * 3
     imp_multi, imp_desc = generate_bitcoin_core_wallet(account_num, examples)
 
     imp_multi = ujson.dumps(imp_multi)
     imp_desc = ujson.dumps(imp_desc)
 
-    body = '''\
+    fp = StringIO()
+    fp.write('''\
 # Bitcoin Core Wallet Import File
 
 https://github.com/Coldcard/firmware/blob/master/docs/bitcoin-core-usage.md
@@ -229,21 +280,23 @@ importmulti '{imp_multi}'
 
 ## Resulting Addresses (first 3)
 
-'''.format(imp_multi=imp_multi, imp_desc=imp_desc, xfp=xfp, nb=chains.current_chain().name)
+'''.format(imp_multi=imp_multi, imp_desc=imp_desc, xfp=xfp, nb=ch.name))
 
-    body += '\n'.join('%s => %s' % t for t in examples)
+    for t in examples:
+        fp.write('%s => %s\n' % t)
 
-    body += '\n'
+    body = fp.getvalue()
+    del fp
 
     OWNERSHIP.note_wallet_used(AF_P2WPKH, account_num)
 
-    ch = chains.current_chain()
     derive = "84h/{coin_type}h/{account}h".format(account=account_num, coin_type=ch.b44_cointype)
     await write_text_file(fname_pattern, body, 'Bitcoin Core', derive + "/0/0", AF_P2WPKH)
 
 def generate_bitcoin_core_wallet(account_num, example_addrs):
     # Generate the data for an RPC command to import keys into Bitcoin Core
     # - yields dicts for json purposes
+    # - fills all slots of example_addrs list with (path, addr)
     from descriptor import Descriptor
 
     chain = chains.current_chain()
@@ -255,11 +308,14 @@ def generate_bitcoin_core_wallet(account_num, example_addrs):
         prefix = sv.derive_path(derive)
         xpub = chain.serialize_public(prefix)
 
-        for i in range(3):
+        # all examples are on the external chain: derive that once
+        change0 = sv.derive_path('0', master=prefix)
+
+        for i in range(len(example_addrs)):
             sp = '0/%d' % i
-            node = sv.derive_path(sp, master=prefix)
+            node = sv.derive_path(str(i), master=change0)
             a = chain.address(node, AF_P2WPKH)
-            example_addrs.append( ('m/%s/%s' % (derive, sp), a) )
+            example_addrs[i] = ('m/%s/%s' % (derive, sp), a)
 
     xfp = settings.get('xfp')
     _, vers, _ = version.get_mpy_version()
@@ -350,6 +406,7 @@ def generate_generic_export(account_num=0):
     from descriptor import Descriptor, multisig_descriptor_template
 
     chain = chains.current_chain()
+    ct = chain.b44_cointype
     master_xfp = settings.get("xfp")
     master_xfp_str = xfp2str(master_xfp)
 
@@ -359,6 +416,9 @@ def generate_generic_export(account_num=0):
                      xpub=settings.get('xpub'))
 
     with stash.SensitiveValues() as sv:
+        # nodes for the parent of each path, derived once and shared (ie. BIP-48)
+        parents = {}
+
         # each of these paths would have /{change}/{idx} in usage (not hardened)
         for name, deriv, fmt, atype, is_ms in [
             ( 'bip44', "m/44h/{ct}h/{acc}h", AF_CLASSIC, 'p2pkh', False ),
@@ -371,11 +431,15 @@ def generate_generic_export(account_num=0):
             if fmt == AF_P2SH and account_num:
                 continue
 
-            dd = deriv.format(ct=chain.b44_cointype, acc=account_num)
-            node = sv.derive_path(dd)
+            dd = deriv.format(ct=ct, acc=account_num)
+            pp, last = dd.rsplit('/', 1)
+            if pp not in parents:
+                parents[pp] = sv.derive_path(pp)
+            node = sv.derive_path(last, master=parents[pp])
             xfp = xfp2str(swab32(node.my_fp()))
             xp = chain.serialize_public(node, AF_CLASSIC)
-            zp = chain.serialize_public(node, fmt) if fmt != AF_CLASSIC else None
+            # P2SH uses classic version bytes, so nothing different to show
+            zp = chain.serialize_public(node, fmt) if fmt not in (AF_CLASSIC, AF_P2SH) else None
             if is_ms:
                 desc = multisig_descriptor_template(xp, dd, master_xfp_str, fmt)
             else:
@@ -394,10 +458,12 @@ def generate_generic_export(account_num=0):
 
             if not is_ms:
                 # bonus/check: first non-change address: 0/0
+                # - derived in place, account node not needed after this; it
+                #   (and the shared parents) are registered w/ sv, so wiped at end
                 node.derive(0, False).derive(0, False)
                 rv[name]['first'] = chain.address(node, fmt)
 
-    sig_deriv = "m/44h/{ct}h/{acc}h".format(ct=chain.b44_cointype, acc=account_num) + "/0/0"
+    sig_deriv = "m/44h/{ct}h/{acc}h".format(ct=ct, acc=account_num) + "/0/0"
     return ujson.dumps(rv), sig_deriv, AF_CLASSIC
 
 def generate_electrum_wallet(addr_type, account_num):
@@ -482,11 +548,10 @@ async def make_json_wallet(label, func, fname_pattern='new-wallet.json'):
             fname, nice = card.pick_filename(fname_pattern)
 
             # do actual write
-            with open(fname, 'wt') as fd:
-                chunk_writer(fd, json_str)
+            with open(fname, 'wb') as fd:
+                h = chunk_writer(fd, json_str)
 
             if not skip_sig:
-                h = ngu.hash.sha256s(json_str.encode())
                 sig_nice = write_sig_file([(h, fname)], derive, addr_fmt)
 
     except CardMissingError:
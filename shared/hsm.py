@@ -238,7 +238,7 @@ class ApprovalRule:
 
         # if specified, 'wallet' must be an existing multisig wallet's name
         if self.wallet and self.wallet != '1':
-            names = [ms.name for ms in MultisigWallet.get_all()]
+            names = [name for _, _, _, name in MultisigWallet.iter_names()]
             assert self.wallet in names, "unknown MS wallet: "+self.wallet
 
         # patterns must be valid
@@ -994,7 +994,7 @@ def hsm_status_report():
             rv['approval_wait'] = True
 
         rv['users'] = Users.list()
-        rv['wallets'] = [ms.name for ms in MultisigWallet.get_all()]
+        rv['wallets'] = [name for _, _, _, name in MultisigWallet.iter_names()]
 
     rv['chain'] = settings.get('chain', 'BTC')
 
@@ -2,14 +2,14 @@
 #
 # multisig.py - support code for multisig signing and p2sh in general.
 #
-import stash, chains, ustruct, ure, uio, sys, ngu, uos, ujson, version
+import stash, chains, ustruct, uio, sys, ngu, uos, ujson, version
 from utils import xfp2str, str2xfp, swab32, cleanup_deriv_path, keypath_to_str, to_ascii_printable
 from utils import str_to_keypath, problem_file_line, parse_extended_key
 from ux import ux_show_story, ux_confirm, ux_dramatic_pause, ux_clear_keys
 from ux import import_export_prompt, ux_enter_bip32_index, show_qr_code
 from files import CardSlot, CardMissingError, needs_microsd
 from descriptor import MultisigDescriptor, multisig_descriptor_template
-from public_constants import AF_P2SH, AF_P2WSH_P2SH, AF_P2WSH, AFC_SCRIPT, MAX_SIGNERS
+from public_constants import AF_P2SH, AF_P2WSH_P2SH, AF_P2WSH, AFC_SCRIPT, MAX_SIGNERS, AF_CLASSIC
 from menu import MenuSystem, MenuItem, ShortcutItem
 from opcodes import OP_CHECKMULTISIG
 from exceptions import FatalPSBTIssue
@@ -22,6 +22,9 @@ TRUST_VERIFY = const(0)
 TRUST_OFFER = const(1)
 TRUST_PSBT = const(2)
 
+# BIP-48 script type (4th path component) => address format
+_BIP48_SCRIPT_FMT = {1: AF_P2WSH_P2SH, 2: AF_P2WSH}
+
 
 class MultisigOutOfSpace(RuntimeError):
     pass
@@ -43,68 +46,92 @@ def disassemble_multisig(redeem_script):
     # - expect OP_1 (pk1) (pk2) (pk3) OP_3 OP_CHECKMULTISIG for 1 of 3 case
     # - returns M, N, (list of pubkeys)
     # - for very unlikely/impossible asserts, dont document reason; otherwise do.
-    from serializations import disassemble
+    # - layout is fixed once M/N known, so just walk the slices
 
     M, N = disassemble_multisig_mn(redeem_script)
     assert 1 <= M <= N <= MAX_SIGNERS, 'M/N range'
     assert len(redeem_script) == 1 + (N * 34) + 1 + 1, 'bad len'
 
-    # generator function
-    dis = disassemble(redeem_script)
-
-    # expect M value first
-    ex_M, opcode =  next(dis)
-    assert ex_M == M and opcode == None, 'bad M'
-
-    # need N pubkeys
+    # need N pubkeys, each pushed w/ 0x21 = 33 = OP_PUSHDATA(33)
     pubkeys = []
-    for idx in range(N):
-        data, opcode = next(dis)
-        assert opcode == None and len(data) == 33, 'data'
+    for pos in range(1, 1 + (N * 34), 34):
+        assert redeem_script[pos] == 0x21, 'data'
+        data = bytes(redeem_script[pos+1:pos+34])
         assert data[0] == 0x02 or data[0] == 0x03, 'Y val'
         pubkeys.append(data)
 
-    assert len(pubkeys) == N
+    # M/N opcodes and CHECKMULTISIG checked by disassemble_multisig_mn(), and
+    # exact length check above means nothing extra at end
 
-    # next is N value
-    ex_N, opcode = next(dis)
-    assert ex_N == N and opcode == None
+    return M, N, pubkeys
 
-    # finally, the opcode: CHECKMULTISIG
-    data, opcode = next(dis)
-    assert opcode == OP_CHECKMULTISIG
+def parse_m_of_n(value):
+    # pull first two numbers from text; same as regex (\d+)\D*(\d+) would
+    # - accepts: 2 of 3    2/3    2,3    2 3   etc
+    # - no second number: split last digit off the first, like regex backtracking
+    # - raises on failure, or if M/N out of range
+    ln = len(value)
+    pos = 0
+    while pos < ln and not value[pos].isdigit():
+        pos += 1
+    start = pos
+    while pos < ln and value[pos].isdigit():
+        pos += 1
+    first = value[start:pos]
+    while pos < ln and not value[pos].isdigit():
+        pos += 1
+    start = pos
+    while pos < ln and value[pos].isdigit():
+        pos += 1
+    second = value[start:pos]
+
+    if not second:
+        assert len(first) >= 2
+        first, second = first[:-1], first[-1]
+
+    M, N = int(first), int(second)
+    assert 1 <= M <= N <= MAX_SIGNERS, 'M/N range'
 
-    # must have reached end of script at this point
-    try:
-        next(dis)
-        raise AssertionError("too long")
-    except StopIteration:
-        # expected, since we're reading past end
-        pass
+    return M, N
 
-    return M, N, pubkeys
+# unpack formats, by number of u32 values; see unpack_xfp_path()
+_xfp_path_fmts = {}
+
+def unpack_xfp_path(k):
+    # PSBT global xpub key: LE32 xfp + LE32 path components => (xfp, path)
+    n = len(k) // 4
+    fmt = _xfp_path_fmts.get(n)
+    if fmt is None:
+        fmt = _xfp_path_fmts[n] = '<%dI' % n
+    rv = ustruct.unpack_from(fmt, k, 0)
+    return rv[0], rv[1:]
 
 def make_redeem_script(M, nodes, subkey_idx):
     # take a list of BIP-32 nodes, and derive Nth subkey (subkey_idx) and make
     # a standard M-of-N redeem script for that. Always applies BIP-67 sorting.
+    # - returns a fresh bytearray (not copied again into bytes)
     N = len(nodes)
     assert 1 <= M <= N <= MAX_SIGNERS
 
-    pubkeys = []
-    for n in nodes:
-        copy = n.copy()
-        copy.derive(subkey_idx, False)
-        # 0x21 = 33 = len(pubkey) = OP_PUSHDATA(33)
-        pubkeys.append(b'\x21' + copy.pubkey())
-        del copy
+    # derive works in-place, so work on a copy; parent node stays as-is for next idx
+    pubkeys = [n.copy().derive(subkey_idx, False).pubkey() for n in nodes]
 
+    # BIP-67: lexicographic order of the 33-byte pubkeys
     pubkeys.sort()
 
-    # serialize redeem script
-    pubkeys.insert(0, bytes([80 + M]))
-    pubkeys.append(bytes([80 + N, OP_CHECKMULTISIG]))
+    # serialize redeem script: OP_M (0x21 pubkey)*N OP_N OP_CHECKMULTISIG
+    rv = bytearray(3 + (34 * N))
+    rv[0] = 80 + M
+    pos = 1
+    for pk in pubkeys:
+        # 0x21 = 33 = len(pubkey) = OP_PUSHDATA(33)
+        rv[pos] = 0x21
+        rv[pos+1:pos+34] = pk
+        pos += 34
+    rv[pos] = 80 + N
+    rv[pos+1] = OP_CHECKMULTISIG
 
-    return b''.join(pubkeys)
+    return rv
 
 class MultisigWallet(WalletABC):
     # Capture the info we need to store long-term in order to participate in a
@@ -123,10 +150,19 @@ class MultisigWallet(WalletABC):
         (AF_P2WSH_P2SH, 'p2sh-p2wsh'),      # preferred
         (AF_P2WSH_P2SH, 'p2wsh-p2sh'),      # obsolete (now an alias)
     ]
+    # for display: addr_fmt => first (preferred) name above
+    _FORMAT_LABELS = dict((k, v.upper()) for k, v in reversed(FORMAT_NAMES))
 
     # optional: user can short-circuit many checks (system wide, one power-cycle only)
     disable_checks = False
 
+    # lookup index over saved wallets (in settings), see _get_index()
+    _index = None
+
+    # one copy of each derivation path string, shared between deserialized wallets
+    # - both dropped by clear_caches() when saved list changes, and when settings reloaded
+    _derivs = {}
+
     def __init__(self, name, m_of_n, xpubs, addr_fmt=AF_P2SH, chain_type='BTC'):
         self.storage_idx = -1
 
@@ -138,19 +174,28 @@ class MultisigWallet(WalletABC):
         self.xpubs = xpubs                  # list of (xfp(int), deriv, xpub(str))
         self.addr_fmt = addr_fmt            # address format for wallet
 
-        # calc useful cache value: numeric xfp+subpath, with lookup
+        # calc useful cache value: numeric xfp+subpath (as tuple), with lookup
+        # - also which xpubs (by index) have each xfp
         self.xfp_paths = {}
-        for xfp, deriv, xpub in self.xpubs:
-            self.xfp_paths[xfp] = str_to_keypath(xfp, deriv)
+        self._xfp_idx = {}
+        for xp_idx, (xfp, deriv, xpub) in enumerate(self.xpubs):
+            self.xfp_paths[xfp] = tuple(str_to_keypath(xfp, deriv))
+            self._xfp_idx.setdefault(xfp, []).append(xp_idx)
 
         assert len(self.xfp_paths) == self.N, 'dup XFP'         # not supported
 
+        # deserialized xpubs, see get_nodes() and get_branch_nodes()
+        self._nodes = None
+        self._branches = {}
+
+        # see get_deriv_paths(), get_xfp_strs() and get_slip132_xpubs()
+        self._deriv_paths = None
+        self._xfp_strs = None
+        self._slip132 = None
+
     @classmethod
     def render_addr_fmt(cls, addr_fmt):
-        for k, v in cls.FORMAT_NAMES:
-            if k == addr_fmt:
-                return v.upper()
-        return '?'
+        return cls._FORMAT_LABELS.get(addr_fmt, '?')
 
     def render_path(self, change_idx, idx):
         # assuming shared derivations for all cosigners. Wrongish.
@@ -195,7 +240,8 @@ class MultisigWallet(WalletABC):
         else:
             # allow for distinct deriv paths on each leg
             opts['d'] = pp
-            xp = [(a, pp.index(deriv),c) for a,deriv,c in self.xpubs]
+            code = {d: i for i, d in enumerate(pp)}
+            xp = [(a, code[deriv], c) for a,deriv,c in self.xpubs]
 
         return (self.name, (self.M, self.N), xp, opts)
 
@@ -213,11 +259,13 @@ class MultisigWallet(WalletABC):
                 # TODO: this should raise a warning, not supported anymore
                 common_prefix = 'm'
             common_prefix = common_prefix.replace("'", "h")
+            common_prefix = cls._derivs.setdefault(common_prefix, common_prefix)
             xpubs = [(a, common_prefix, b) for a,b in xpubs]
         else:
             # new format decompression
             if 'd' in opts:
                 derivs = [p.replace("'", "h") for p in opts.get('d')]
+                derivs = [cls._derivs.setdefault(p, p) for p in derivs]
                 xpubs = [(a, derivs[b], c) for a,b,c in xpubs]
 
         rv = cls(name, m_of_n, xpubs, addr_fmt=opts.get('ft', AF_P2SH),
@@ -227,21 +275,74 @@ class MultisigWallet(WalletABC):
         return rv
 
     @classmethod
-    def iter_wallets(cls, M=None, N=None, not_idx=None, addr_fmt=None):
-        # yield MS wallets we know about, that match at least right M,N if known.
-        # - this is only place we should be searching this list, please!!
+    def clear_caches(cls):
+        # saved wallets changed: forget index and paths
+        cls._index = None
+        cls._derivs = {}
+
+    @classmethod
+    def _get_index(cls):
+        # Index of saved wallets, built w/o deserializing anything:
+        # - (M, N, addr_fmt) => [idx, ...]
+        # - (M, N, xor of xfps) => [idx, ...]
+        # - set of xfps, for each idx
+        # Only derived values kept, not the list itself. Rebuilt if settings
+        # reloaded (ie. other seed), and dropped by clear_caches().
         lst = settings.get('multisig', [])
 
+        ix = cls._index
+        if ix and ix[0] == settings.generation and ix[1] == len(lst):
+            return (lst,) + ix[1:]
+
+        if ix and ix[0] != settings.generation:
+            # paths of other seed's wallets aren't needed
+            cls._derivs = {}
+
+        by_fmt = {}
+        by_xor = {}
+        xfp_sets = []
         for idx, rec in enumerate(lst):
+            M, N = rec[1]
+            af = rec[3].get('ft', AF_P2SH)
+            by_fmt.setdefault((M, N, af), []).append(idx)
+
+            x = 0
+            for xp in rec[2]:
+                x ^= xp[0]
+            by_xor.setdefault((M, N, x), []).append(idx)
+
+            xfp_sets.append(frozenset(xp[0] for xp in rec[2]))
+
+        cls._index = ix = (settings.generation, len(lst), by_fmt, by_xor, xfp_sets)
+        return (lst,) + ix[1:]
+
+    @classmethod
+    def iter_wallets(cls, M=None, N=None, not_idx=None, addr_fmt=None, xfps=None):
+        # yield MS wallets we know about, that match at least right M,N if known.
+        # - this is only place we should be searching this list, please!!
+        # - xfps: set of xfp values that all must be used by wallet
+        lst, _, by_fmt, _, xfp_sets = cls._get_index()
+        if M is not None and N is not None and addr_fmt is not None:
+            # fully specified: index has the answer
+            todo = by_fmt.get((M, N, addr_fmt), ())
+        else:
+            todo = range(len(lst))
+
+        for idx in todo:
+            rec = lst[idx]
             if idx == not_idx:
                 # ignore one by index
                 continue
 
-            if M or N:
+            if xfps is not None and not (xfps <= xfp_sets[idx]):
+                # some xfp not used by this wallet
+                continue
+
+            if M is not None or N is not None:
                 # peek at M/N
-                has_m, has_n = tuple(rec[1])
-                if M is not None and has_m != M: continue
-                if N is not None and has_n != N: continue
+                mn = rec[1]
+                if M is not None and mn[0] != M: continue
+                if N is not None and mn[1] != N: continue
 
             if addr_fmt is not None:
                 opts = rec[3]
@@ -251,7 +352,7 @@ class MultisigWallet(WalletABC):
             yield cls.deserialize(rec, idx)
 
     def get_xfp_paths(self):
-        # return list of lists [xfp, *deriv]
+        # return list of tuples (xfp, *deriv)
         return list(self.xfp_paths.values())
 
     @classmethod
@@ -260,7 +361,8 @@ class MultisigWallet(WalletABC):
         # - xfp_paths is list of lists: [xfp, *path] like in psbt files
         # - M and N must be known
         # - returns instance, or None if not found
-        for rv in cls.iter_wallets(M, N, addr_fmt=addr_fmt):
+        xfps = frozenset(x[0] for x in xfp_paths)
+        for rv in cls.iter_wallets(M, N, addr_fmt=addr_fmt, xfps=xfps):
             if rv.matching_subpaths(xfp_paths):
                 return rv
 
@@ -276,7 +378,8 @@ class MultisigWallet(WalletABC):
         N = len(xfp_paths)
         
         matches = []
-        for rv in cls.iter_wallets(M=M, addr_fmt=addr_fmt):
+        xfps = frozenset(x[0] for x in xfp_paths)
+        for rv in cls.iter_wallets(M=M, N=N, addr_fmt=addr_fmt, xfps=xfps):
             if rv.matching_subpaths(xfp_paths):
                 matches.append(rv)
 
@@ -291,9 +394,13 @@ class MultisigWallet(WalletABC):
             # cannot be the same if  len(w0.N) != len(w1.N)
             # maybe check duplicates first?
             return False
+
+        # cheap: all xfp values known here? before comparing any paths
         for x in xfp_paths:
             if x[0] not in self.xfp_paths:
                 return False
+
+        for x in xfp_paths:
             prefix = self.xfp_paths[x[0]]
 
             if len(x) < len(prefix):
@@ -301,8 +408,9 @@ class MultisigWallet(WalletABC):
                 #print('path len: %d vs %d' % (len(prefix), len(x)))
                 return False
 
+            # prefix is already a tuple
             comm = len(prefix)
-            if tuple(prefix[:comm]) != tuple(x[:comm]):
+            if tuple(x[:comm]) != prefix:
                 # xfp => maps to wrong path
                 #print('path mismatch:\n%r\n%r\ncomm=%d' % (prefix[:comm], x[:comm], comm))
                 return False
@@ -320,22 +428,20 @@ class MultisigWallet(WalletABC):
     @classmethod
     def quick_check(cls, M, N, xfp_xor):
         # quicker? USB method.
-        rv = []
-        for ms in cls.iter_wallets(M, N):
-            x = 0
-            for xfp in ms.xfp_paths.keys():
-                x ^= xfp
-            if x != xfp_xor: continue
-
-            return True
-
-        return False
+        return bool(cls._get_index()[3].get((M, N, xfp_xor)))
 
     @classmethod
     def get_all(cls):
         # return them all, as a generator
         return cls.iter_wallets()
 
+    @classmethod
+    def iter_names(cls):
+        # yield (storage_idx, M, N, name) for each wallet, without deserializing it
+        for idx, rec in enumerate(settings.get('multisig', [])):
+            M, N = rec[1]
+            yield idx, M, N, rec[0]
+
     @classmethod
     def exists(cls):
         # are there any wallets defined?
@@ -357,17 +463,20 @@ class MultisigWallet(WalletABC):
         # - important that this fails immediately when nvram overflows
         obj = self.serialize()
 
+        # live list from settings; remember just enough to undo (not a full copy)
         v = settings.get('multisig', [])
-        orig = v.copy()
         if not v or self.storage_idx == -1:
             # create
             self.storage_idx = len(v)
             v.append(obj)
+            prev = None
         else:
             # update in place
+            prev = v[self.storage_idx]
             v[self.storage_idx] = obj
 
         settings.set('multisig', v)
+        MultisigWallet.clear_caches()
 
         # save now, rather than in background, so we can recover
         # from out-of-space situation
@@ -376,7 +485,12 @@ class MultisigWallet(WalletABC):
         except:
             # back out change; no longer sure of NVRAM state
             try:
-                settings.set('multisig', orig)
+                if prev is None:
+                    v.pop()
+                else:
+                    v[self.storage_idx] = prev
+                settings.set('multisig', v)
+                MultisigWallet.clear_caches()
                 settings.save()
             except: pass        # give up on recovery
 
@@ -389,18 +503,28 @@ class MultisigWallet(WalletABC):
         #   - diff_items: text list of similarity/differences
         #   - count_similar: same N, same xfp+paths
 
+        # one pass over saved wallets: same xfp+paths implies same N
         lst = self.get_xfp_paths()
-        c = self.find_match(self.M, self.N, lst, addr_fmt=self.addr_fmt)
-        if c:
-            # All details are same: M/N, paths, addr fmt
-            if self.xpubs != c.xpubs:
-                return None, ['xpubs'], 0
-            elif self.name == c.name:
-                return None, [], 1
-            else:
-                return c, ['name'], 0
+        similar = []
+
+        # cosigner order doesn't matter (BIP-67), so compare xpubs as sets
+        # - nothing lost by using sets: xfps are unique within a wallet ('dup XFP' check)
+        my_xpubs = frozenset(self.xpubs)
+        for c in self.iter_wallets(N=self.N, xfps=frozenset(self.xfp_paths)):
+            if not c.matching_subpaths(lst):
+                continue
+
+            if c.M == self.M and c.addr_fmt == self.addr_fmt:
+                # All details are same: M/N, paths, addr fmt
+                if my_xpubs != frozenset(c.xpubs):
+                    return None, ['xpubs'], 0
+                elif self.name == c.name:
+                    return None, [], 1
+                else:
+                    return c, ['name'], 0
+
+            similar.append(c)
 
-        similar = MultisigWallet.find_candidates(lst)
         if not similar:
             # no matches, good.
             return None, [], 0
@@ -416,7 +540,7 @@ class MultisigWallet(WalletABC):
                 diffs.add('address type')
             if c.name != self.name:
                 diffs.add('name')
-            if c.xpubs != self.xpubs:
+            if frozenset(c.xpubs) != my_xpubs:
                 diffs.add('xpubs')
 
         return None, diffs, len(similar)
@@ -435,6 +559,7 @@ class MultisigWallet(WalletABC):
 
         lst = settings.get('multisig', [])
         del lst[self.storage_idx]
+        MultisigWallet.clear_caches()
         if lst:
             settings.set('multisig', lst)
         else:
@@ -443,10 +568,41 @@ class MultisigWallet(WalletABC):
 
         self.storage_idx = -1
 
+    def get_nodes(self):
+        # BIP-32 node for each xpub, in same order as self.xpubs; made once as needed
+        # - shared: copy() before derive()
+        if self._nodes is None:
+            ch = self.chain
+            self._nodes = [ch.deserialize_node(xpub, AF_P2SH) for _, _, xpub in self.xpubs]
+        return self._nodes
+
+    def get_branch_nodes(self, change_idx):
+        # cosigner nodes, already derived to change_idx; kept for usual 0 and 1 cases
+        # - shared: copy() before derive()
+        rv = self._branches.get(change_idx)
+        if rv is None:
+            rv = [n.copy().derive(change_idx, False) for n in self.get_nodes()]
+            if change_idx in (0, 1):
+                self._branches[change_idx] = rv
+        return rv
+
+    def get_xfp_strs(self):
+        # xfp2str() of each xpub's fingerprint, same order as self.xpubs; for rendering
+        if self._xfp_strs is None:
+            self._xfp_strs = [xfp2str(xfp) for xfp, _, _ in self.xpubs]
+        return self._xfp_strs
+
+    def get_slip132_xpubs(self):
+        # SLIP-132 [yz]pub for each xpub, per our addr_fmt; for rendering
+        # - only meaningful when not p2sh
+        if self._slip132 is None:
+            ch, af = self.chain, self.addr_fmt
+            self._slip132 = [ch.serialize_public(n, af) for n in self.get_nodes()]
+        return self._slip132
+
     def xpubs_with_xfp(self, xfp):
         # return set of indexes of xpubs with indicated xfp
-        return set(xp_idx for xp_idx, (wxfp, _, _) in enumerate(self.xpubs)
-                        if wxfp == xfp)
+        return set(self._xfp_idx.get(xfp, ()))
 
     def yield_addresses(self, start_idx, count, change_idx=0):
         # Assuming a suffix of /0/0 on the defined prefix's, yield
@@ -455,17 +611,12 @@ class MultisigWallet(WalletABC):
 
         assert self.addr_fmt, 'no addr fmt known'
 
-        # setup
-        nodes = []
-        paths = []
-        for xfp, deriv, xpub in self.xpubs:
-            # load bip32 node for each cosigner
-            node = ch.deserialize_node(xpub, AF_P2SH)
-            node.derive(change_idx, False)
-            # indicate path used (for UX)
-            path = "[%s/%s/%d/{idx}]" % (xfp2str(xfp), deriv[2:], change_idx)
-            nodes.append(node)
-            paths.append(path)
+        # setup: nodes derived down to change_idx, kept across batches
+        nodes = self.get_branch_nodes(change_idx)
+
+        # indicate path used (for UX); idx and closing bracket appended below
+        paths = ["[%s/%s/%d/" % (xfp_s, xp[1][2:], change_idx)
+                    for xfp_s, xp in zip(self.get_xfp_strs(), self.xpubs)]
 
         idx = start_idx
         while count:
@@ -475,7 +626,8 @@ class MultisigWallet(WalletABC):
             script = make_redeem_script(self.M, nodes, idx)
             addr = ch.p2sh_address(self.addr_fmt, script)
 
-            yield idx, addr, [p.format(idx=idx) for p in paths], script
+            sidx = '%d]' % idx
+            yield idx, addr, [p + sidx for p in paths], script
 
             idx += 1
             count -= 1
@@ -491,7 +643,14 @@ class MultisigWallet(WalletABC):
 
         subpath_help = []
         used = set()
-        ch = self.chain
+
+        def where(xfp, path, dp):
+            # Document path(s) used. Not sure this is useful info to user tho.
+            # - Do not show what we can't verify: we don't really know the hardeneded
+            #   part of the path from fingerprint to here.
+            if dp == len(path):
+                return '[%s]' % xfp2str(xfp)
+            return '[%s%s%s]' % (xfp2str(xfp), '/_'*dp, keypath_to_str(path[dp:], '/', 0))
 
         M, N, pubkeys = disassemble_multisig(redeem_script)
         assert M==self.M and N == self.N, 'wrong M/N in script'
@@ -508,8 +667,7 @@ class MultisigWallet(WalletABC):
                 assert pubkey in subpaths, "unexpected pubkey"
                 xfp, *path = subpaths[pubkey]
 
-                for xp_idx, (wxfp, _, xpub) in enumerate(self.xpubs):
-                    if wxfp != xfp: continue
+                for xp_idx in self._xfp_idx.get(xfp, ()):
                     if xp_idx in used: continue      # only allow once
                     check_these.append((xp_idx, path))
             else:
@@ -523,13 +681,11 @@ class MultisigWallet(WalletABC):
                     if xp_idx in used: continue      # only allow once
                     check_these.append((xp_idx, path))
 
-            here = None
+            tried = None
             too_shallow = False
             for xp_idx, path in check_these:
                 # matched fingerprint, try to make pubkey that needs to match
-                xpub = self.xpubs[xp_idx][-1]
-
-                node = ch.deserialize_node(xpub, AF_P2SH); assert node
+                node = self.get_nodes()[xp_idx].copy()
                 dp = node.depth()
 
                 #print("%s => deriv=%s dp=%d len(path)=%d path=%s" %
@@ -547,22 +703,17 @@ class MultisigWallet(WalletABC):
 
                 found_pk = node.pubkey()
 
-                # Document path(s) used. Not sure this is useful info to user tho.
-                # - Do not show what we can't verify: we don't really know the hardeneded
-                #   part of the path from fingerprint to here.
-                here = '[%s]' % xfp2str(xfp)
-                if dp != len(path):
-                    here = here[:-1] + ('/_'*dp) + keypath_to_str(path[dp:], '/', 0) + "]"
-
                 if found_pk != pubkey:
                     # Not a match but not an error by itself, since might be 
                     # another dup xfp to look at still.
+                    # - path text only built if needed for error msg
 
                     #print('pk mismatch: %s => %s != %s' % (
-                    #                here, b2a_hex(found_pk), b2a_hex(pubkey)))
+                    #                where(xfp, path, dp), b2a_hex(found_pk), b2a_hex(pubkey)))
+                    tried = (path, dp)
                     continue
 
-                subpath_help.append(here)
+                subpath_help.append(where(xfp, path, dp))
 
                 used.add(xp_idx)
                 break
@@ -570,8 +721,8 @@ class MultisigWallet(WalletABC):
                 msg = 'pk#%d wrong' % (pk_order+1)
                 if not check_these:
                     msg += ', unknown XFP'
-                elif here:
-                    msg += ', tried: ' + here
+                elif tried:
+                    msg += ', tried: ' + where(xfp, *tried)
                 if too_shallow:
                     msg += ', too shallow'
                 raise AssertionError(msg)
@@ -594,6 +745,7 @@ class MultisigWallet(WalletABC):
         xpubs = []
         addr_fmt = AF_P2SH
         my_xfp = settings.get('xfp')
+        expect_chain = chains.current_chain().ctype
         for ln in lines:
             # remove comments
             comm = ln.find('#')
@@ -625,11 +777,7 @@ class MultisigWallet(WalletABC):
             elif label == 'policy':
                 try:
                     # accepts: 2 of 3    2/3    2,3    2 3   etc
-                    mat = ure.search(r'(\d+)\D*(\d+)', value)
-                    assert mat
-                    M = int(mat.group(1))
-                    N = int(mat.group(2))
-                    assert 1 <= M <= N <= MAX_SIGNERS
+                    M, N = parse_m_of_n(value)
                 except:
                     raise AssertionError('bad policy line')
 
@@ -659,7 +807,7 @@ class MultisigWallet(WalletABC):
                     continue
 
                 # deserialize, update list and lots of checks
-                is_mine = cls.check_xpub(xfp, value, deriv, chains.current_chain().ctype, my_xfp, xpubs)
+                is_mine = cls.check_xpub(xfp, value, deriv, expect_chain, my_xfp, xpubs)
                 if is_mine:
                     has_mine += 1
 
@@ -670,12 +818,13 @@ class MultisigWallet(WalletABC):
         # excpect descriptor here if only one line, normal multisig file requires more lines
         has_mine = 0
         my_xfp = settings.get('xfp')
+        expect_chain = chains.current_chain().ctype
         xpubs = []
 
         desc = MultisigDescriptor.parse(descriptor)
         for xfp, deriv, xpub in desc.keys:
             deriv = cleanup_deriv_path(deriv)
-            is_mine = cls.check_xpub(xfp, xpub, deriv, chains.current_chain().ctype, my_xfp, xpubs)
+            is_mine = cls.check_xpub(xfp, xpub, deriv, expect_chain, my_xfp, xpubs)
             if is_mine:
                 has_mine += 1
         return None, desc.addr_fmt, xpubs, has_mine, desc.M, desc.N
@@ -757,8 +906,9 @@ class MultisigWallet(WalletABC):
         #   seems like more restrictive than needed, so "m" is allowed
 
         try:
-            # Note: addr fmt detected here via SLIP-132 isn't useful
-            node, chain, _ = parse_extended_key(xpub)
+            # Note: addr fmt detected here via SLIP-132 isn't useful, except
+            # to know if xpub already in standard form (see below)
+            node, chain, slip_fmt = parse_extended_key(xpub)
         except:
             raise AssertionError('unable to parse xpub')
 
@@ -820,7 +970,10 @@ class MultisigWallet(WalletABC):
 
         # serialize xpub w/ BIP-32 standard now.
         # - this has effect of stripping SLIP-132 confusion away
-        xpubs.append((xfp, deriv, chain.serialize_public(node, AF_P2SH)))
+        # - skip if already standard, and nothing else in string (x/tpub always 111 chars)
+        if slip_fmt != AF_CLASSIC or len(xpub) != 111:
+            xpub = chain.serialize_public(node, AF_P2SH)
+        xpubs.append((xfp, deriv, xpub))
 
         return (xfp == my_xfp)
 
@@ -836,23 +989,20 @@ class MultisigWallet(WalletABC):
             rv = dict(seed_version=17, use_encryption=False,
                         wallet_type='%dof%d' % (self.M, self.N))
 
-            ch = self.chain
+            # CHALLENGE: we must do slip-132 format [yz]pubs here when not p2sh mode.
+            # - otherwise, our stored xpub is the right value
+            slip132 = self.get_slip132_xpubs() if self.addr_fmt != AF_P2SH else None
+            xfp_strs = self.get_xfp_strs()
 
             # the important stuff.
             for idx, (xfp, deriv, xpub) in enumerate(self.xpubs): 
 
-                node = None
-                if self.addr_fmt != AF_P2SH:
-                    # CHALLENGE: we must do slip-132 format [yz]pubs here when not p2sh mode.
-                    node = ch.deserialize_node(xpub, AF_P2SH); assert node
-                    xp = ch.serialize_public(node, self.addr_fmt)
-                else:
-                    xp = xpub
+                xp = slip132[idx] if slip132 else xpub
 
                 rv['x%d/' % (idx+1)] = dict(
                                 hw_type='coldcard', type='hardware',
                                 ckcc_xfp=xfp,
-                                label='Coldcard %s' % xfp2str(xfp),
+                                label='Coldcard %s' % xfp_strs[idx],
                                 derivation=deriv, xpub=xp)
 
             # sign export with first p2pkh key
@@ -885,19 +1035,22 @@ class MultisigWallet(WalletABC):
         if choice == KEY_CANCEL:
             return
         elif choice in (KEY_NFC, KEY_QR):
+            # one copy of the text, and release the buffer before showing it
             with uio.StringIO() as fp:
                 self.render_export(fp, hdr_comment=hdr, descriptor=descriptor,
                                    core=core, desc_pretty=desc_pretty)
-                if choice == KEY_NFC:
-                    await NFC.share_text(fp.getvalue())
-                else:
-                    try:
-                        await show_qr_code(fp.getvalue())
-                    except (ValueError, RuntimeError):
-                        if version.has_qwerty:
-                            # do BBQr on Q
-                            from ux_q1 import show_bbqr_codes
-                            await show_bbqr_codes('U', fp.getvalue(), label)
+                body = fp.getvalue()
+
+            if choice == KEY_NFC:
+                await NFC.share_text(body)
+            else:
+                try:
+                    await show_qr_code(body)
+                except (ValueError, RuntimeError):
+                    if version.has_qwerty:
+                        # do BBQr on Q
+                        from ux_q1 import show_bbqr_codes
+                        await show_bbqr_codes('U', body, label)
             return
 
         try:
@@ -944,21 +1097,25 @@ class MultisigWallet(WalletABC):
                     desc = desc_obj.serialize()
                 print("%s\n" % desc, file=fp)
         else:
+            # build all lines, then one write
+            parts = []
             if hdr_comment:
-                print("# Coldcard Multisig setup file (%s)\n#" % hdr_comment, file=fp)
+                parts.append("# Coldcard Multisig setup file (%s)\n#\n" % hdr_comment)
 
-            print("Name: %s\nPolicy: %d of %d" % (self.name, self.M, self.N), file=fp)
+            parts.append("Name: %s\nPolicy: %d of %d\n" % (self.name, self.M, self.N))
 
             if self.addr_fmt != AF_P2SH:
-                print("Format: " + self.render_addr_fmt(self.addr_fmt), file=fp)
+                parts.append("Format: %s\n" % self.render_addr_fmt(self.addr_fmt))
 
             last_deriv = None
-            for xfp, deriv, val in self.xpubs:
+            for xfp_s, (_, deriv, val) in zip(self.get_xfp_strs(), self.xpubs):
                 if last_deriv != deriv:
-                    print("\nDerivation: %s\n" % deriv, file=fp)
+                    parts.append("\nDerivation: %s\n\n" % deriv)
                     last_deriv = deriv
 
-                print('%s: %s' % (xfp2str(xfp), val), file=fp)
+                parts.append('%s: %s\n' % (xfp_s, val))
+
+            fp.write(''.join(parts))
 
     @classmethod
     def guess_addr_fmt(cls, npath):
@@ -981,11 +1138,7 @@ class MultisigWallet(WalletABC):
         if top == 48:
             if len(npath) < 4: return
 
-            last = npath[3] & 0x7fffffff
-            if last == 1:
-                return AF_P2WSH_P2SH
-            if last == 2:
-                return AF_P2WSH
+            return _BIP48_SCRIPT_FMT.get(npath[3] & 0x7fffffff)
 
     @classmethod
     def import_from_psbt(cls, M, N, xpubs_list):
@@ -1011,7 +1164,7 @@ class MultisigWallet(WalletABC):
         has_mine = 0
 
         for k, v in xpubs_list:
-            xfp, *path = ustruct.unpack_from('<%dI' % (len(k)//4), k, 0)
+            xfp, path = unpack_xfp_path(k)
             xpub = ngu.codecs.b58_encode(v)
             is_mine = cls.check_xpub(xfp, xpub, keypath_to_str(path, skip=0),
                                                         expect_chain, my_xfp, xpubs)
@@ -1039,14 +1192,25 @@ class MultisigWallet(WalletABC):
         # Any issue here is a fraud attempt in some way, not innocent.
         # But it would not have tricked us and so the attack targets some other signer.
         assert len(xpubs_list) == self.N
+        chain_type = self.chain_type
 
         for k, v in xpubs_list:
-            xfp, *path = ustruct.unpack_from('<%dI' % (len(k)//4), k, 0)
+            xfp, path = unpack_xfp_path(k)
             xpub = ngu.codecs.b58_encode(v)
 
+            # find in our records.
+            # - always found, since we picked wallet based on xfps (and those are unique)
+            x_idx = self._xfp_idx.get(xfp)
+
+            # compare numeric paths; text form only needed if they differ
+            if x_idx and self.xfp_paths[xfp][1:] == path:
+                deriv = self.xpubs[x_idx[0]][1]
+            else:
+                deriv = keypath_to_str(path, skip=0)
+
             # cleanup and normalize xpub
             tmp = []
-            self.check_xpub(xfp, xpub, keypath_to_str(path, skip=0), self.chain_type, 0, tmp)
+            self.check_xpub(xfp, xpub, deriv, chain_type, 0, tmp)
             (_, deriv, xpub_reserialized) = tmp[0]
             assert deriv            # because given as arg
 
@@ -1055,20 +1219,19 @@ class MultisigWallet(WalletABC):
                 # old pre-3.2.1 MS wallet lacks derivation details for all legs
                 continue
 
-            # find in our records.
-            for (x_xfp, x_deriv, x_xpub) in self.xpubs: 
-                if x_xfp != xfp: continue
-                # found matching XFP
-                assert deriv == x_deriv
+            assert x_idx
+            _, x_deriv, x_xpub = self.xpubs[x_idx[0]]
 
-                assert xpub_reserialized == x_xpub, 'xpub wrong (xfp=%s)' % xfp2str(xfp)
-                break
-            else:
-                assert False            # not reachable, since we picked wallet based on xfps
+            assert deriv == x_deriv
+            assert xpub_reserialized == x_xpub, 'xpub wrong (xfp=%s)' % xfp2str(xfp)
 
     def get_deriv_paths(self):
         # List of unique derivation paths being used. Often length one.
         # - also a rendered single-value summary
+        # - xpubs don't change, so calc once; used per address by render_path()
+        if self._deriv_paths:
+            return self._deriv_paths
+
         derivs =  sorted(set(d for _,d,_ in self.xpubs))
 
         if len(derivs) == 1:
@@ -1076,7 +1239,9 @@ class MultisigWallet(WalletABC):
         else:
             dsum = 'Varies (%d)' % len(derivs)
 
-        return derivs, dsum
+        self._deriv_paths = (derivs, dsum)
+
+        return self._deriv_paths
 
     async def confirm_import(self):
         # prompt them about a new wallet, let them see details and then commit change.
@@ -1140,10 +1305,12 @@ Press (1) to see extended public keys, '''.format(M=M, N=N, name=self.name, exp=
 
             if ch == 'y' and not is_dup:
                 # save to nvram, may raise MultisigOutOfSpace
+                assert self.storage_idx == -1
+
                 if name_change:
-                    name_change.delete()
+                    # rename: replace existing record in place, one NVRAM write
+                    self.storage_idx = name_change.storage_idx
 
-                assert self.storage_idx == -1
                 self.commit()
                 await ux_dramatic_pause("Saved.", 2)
             break
@@ -1152,32 +1319,32 @@ Press (1) to see extended public keys, '''.format(M=M, N=N, name=self.name, exp=
 
     async def show_detail(self, verbose=True):
         # Show the xpubs; might be 2k or more rendered.
-        msg = uio.StringIO()
+        parts = []
 
         if verbose:
-            msg.write('''
+            parts.append('''
 Policy: {M} of {N}
 Blockchain: {ctype}
 Addresses:
   {at}\n\n'''.format(M=self.M, N=self.N, ctype=self.chain_type,
             at=self.render_addr_fmt(self.addr_fmt)))
 
+        slip132 = self.get_slip132_xpubs() if self.addr_fmt != AF_P2SH else None
+        xfp_strs = self.get_xfp_strs()
+
         # concern: the order of keys here is non-deterministic
         for idx, (xfp, deriv, xpub) in enumerate(self.xpubs):
             if idx:
-                msg.write('\n---===---\n\n')
+                parts.append('\n---===---\n\n')
 
-            msg.write('%s:\n  %s\n\n%s\n' % (xfp2str(xfp), deriv, xpub))
+            parts.append('%s:\n  %s\n\n%s\n' % (xfp_strs[idx], deriv, xpub))
 
-            if self.addr_fmt != AF_P2SH:
+            if slip132:
                 # SLIP-132 format [yz]pubs here when not p2sh mode.
                 # - has same info as proper bitcoin serialization, but looks much different
-                node = self.chain.deserialize_node(xpub, AF_P2SH)
-                xp = self.chain.serialize_public(node, self.addr_fmt)
-
-                msg.write('\nSLIP-132 equiv:\n%s\n' % xp)
+                parts.append('\nSLIP-132 equiv:\n%s\n' % slip132[idx])
 
-        return await ux_show_story(msg, title=self.name)
+        return await ux_show_story(''.join(parts), title=self.name)
 
 async def no_ms_yet(*a):
     # action for 'no wallets yet' menu item
@@ -1259,10 +1426,11 @@ class MultisigMenu(MenuSystem):
         if not MultisigWallet.exists():
             rv = [MenuItem('(none setup yet)', f=no_ms_yet)]
         else:
+            # full wallet is only loaded when picked, see make_ms_wallet_menu()
             rv = []
-            for ms in MultisigWallet.get_all():
-                rv.append(MenuItem('%d/%d: %s' % (ms.M, ms.N, ms.name),
-                            menu=make_ms_wallet_menu, arg=ms.storage_idx))
+            for idx, M, N, name in MultisigWallet.iter_names():
+                rv.append(MenuItem('%d/%d: %s' % (M, N, name),
+                            menu=make_ms_wallet_menu, arg=idx))
         from glob import NFC
         rv.append(MenuItem('Import from File', f=import_multisig))
         rv.append(MenuItem('Import from QR', f=import_multisig_qr,
@@ -1445,34 +1613,46 @@ OK to continue. X to abort.'''.format(coin=chain.b44_cointype)
         ( "m/48h/{coin}h/{acct_num}h/2h", 'p2wsh', AF_P2WSH ),
     ]
 
-    def render(fp):
-        fp.write('{\n')
+    # BIP-48 paths above differ only in last (script type) step
+    acct_path = "m/48h/{coin}h/{acct_num}h".format(coin=chain.b44_cointype, acct_num=acct_num)
+
+    def render():
+        # manual JSON, so more human-readable; returns the text
+        parts = ['{\n']
         with stash.SensitiveValues() as sv:
+            acct_node = None
             for deriv, name, fmt in todo:
                 if fmt == AF_P2SH and acct_num:
                     continue
                 dd = deriv.format(coin=chain.b44_cointype, acct_num=acct_num)
-                node = sv.derive_path(dd)
+                if dd.startswith(acct_path + '/'):
+                    # derive hardened account prefix just once
+                    if acct_node is None:
+                        acct_node = sv.derive_path(acct_path)
+                    node = sv.derive_path(dd[len(acct_path):], master=acct_node)
+                else:
+                    node = sv.derive_path(dd)
                 xp = chain.serialize_public(node, fmt)
-                fp.write('  "%s_deriv": "%s",\n' % (name, dd))
-                fp.write('  "%s": "%s",\n' % (name, xp))
+                parts.append('  "%s_deriv": "%s",\n' % (name, dd))
+                parts.append('  "%s": "%s",\n' % (name, xp))
                 xpub = chain.serialize_public(node)
                 descriptor_template = multisig_descriptor_template(xpub, dd, xfp, fmt)
                 if descriptor_template is None:
                     continue
-                fp.write('  "%s_desc": "%s",\n' % (name, descriptor_template))
+                parts.append('  "%s_desc": "%s",\n' % (name, descriptor_template))
+
+        parts.append('  "account": "%d",\n' % acct_num)
+        parts.append('  "xfp": "%s"\n}\n' % xfp)
 
-        fp.write('  "account": "%d",\n' % acct_num)
-        fp.write('  "xfp": "%s"\n}\n' % xfp)
+        return ''.join(parts)
 
     if choice in (KEY_NFC, KEY_QR):
-        with uio.StringIO() as fp:
-            render(fp)
-            if choice == KEY_NFC:
-                await NFC.share_json(fp.getvalue())
-            elif version.has_qwerty:
-                from ux_q1 import show_bbqr_codes
-                await show_bbqr_codes('J', fp.getvalue(), label)
+        body = render()
+        if choice == KEY_NFC:
+            await NFC.share_json(body)
+        elif version.has_qwerty:
+            from ux_q1 import show_bbqr_codes
+            await show_bbqr_codes('J', body, label)
         return
 
     try:
@@ -1480,7 +1660,7 @@ OK to continue. X to abort.'''.format(coin=chain.b44_cointype)
             fname, nice = card.pick_filename(fname_pattern)
             # do actual write: manual JSON here so more human-readable.
             with open(fname, 'w+') as fp:
-                render(fp)
+                fp.write(render())
             #     fp.seek(0)
             #     contents = fp.read()
             # TODO re-enable once we know how to proceed with regards to with which key to sign
@@ -1514,6 +1694,7 @@ async def ondevice_multisig_create(mode='p2wsh', addr_fmt=AF_P2WSH, force_vdisk=
     files = []
     has_mine = 0
     deriv = None
+    deriv_key = mode + '_deriv'         # ie. 'p2wsh_deriv' in ccxp-*.json
     try:
         with CardSlot(force_vdisk=force_vdisk) as card:
             for path in card.get_paths():
@@ -1545,10 +1726,10 @@ async def ondevice_multisig_create(mode='p2wsh', addr_fmt=AF_P2WSH, force_vdisk=
                         # value in file is BE32, but we want LE32 internally
                         xfp = str2xfp(vals['xfp'])
                         if not deriv:
-                            deriv = cleanup_deriv_path(vals[mode+'_deriv'])
+                            deriv = cleanup_deriv_path(vals[deriv_key])
                         else:
-                            assert deriv == vals[mode+'_deriv'], "wrong derivation: %s != %s"%(
-                                            deriv, vals[mode+'_deriv'])
+                            assert deriv == vals[deriv_key], "wrong derivation: %s != %s"%(
+                                            deriv, vals[deriv_key])
 
                         is_mine = MultisigWallet.check_xpub(xfp, ln, deriv,
                                                     chain.ctype, my_xfp, xpubs)
@@ -1570,15 +1751,14 @@ async def ondevice_multisig_create(mode='p2wsh', addr_fmt=AF_P2WSH, force_vdisk=
         return
 
     # remove dups; easy to happen if you double-tap the export
-    delme = set()
-    for i in range(len(xpubs)):
-        for j in range(len(xpubs)):
-            if j in delme: continue
-            if i == j: continue
-            if xpubs[i] == xpubs[j]:
-                delme.add(j)
-    if delme:
-        xpubs = [x for idx,x in enumerate(xpubs) if idx not in delme]
+    # - keeps first of each, in order found
+    seen = set()
+    uniq = []
+    for x in xpubs:
+        if x not in seen:
+            seen.add(x)
+            uniq.append(x)
+    xpubs = uniq
 
     if not xpubs or len(xpubs) == 1 and has_mine:
         await ux_show_story("Unable to find any Coldcard exported keys on this card. Must have filename: ccxp-....json")
@@ -1705,13 +1885,12 @@ async def import_multisig(*a):
             return
 
     def possible(filename):
+        # file_picker() limits size (below), so read whole file and search it
         with open(filename, 'rt') as fd:
-            for ln in fd:
-                if "sh(" in ln or "wsh(" in ln:
-                    # descriptor import
-                    return True
-                if 'pub' in ln:
-                    return True
+            txt = fd.read()
+
+        # descriptor import ("sh(" also covers "wsh("), or xpubs
+        return ("sh(" in txt) or ('pub' in txt)
 
     fn = await file_picker(suffix='.txt', min_size=100, max_size=20*200,
                            taster=possible, force_vdisk=force_vdisk)
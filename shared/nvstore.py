@@ -111,6 +111,10 @@ class SettingsObject:
         self.nvram_key = nvram_key or bytes(32)
         self.current = self.default_values()
 
+        # changes each time all values are replaced (load/blank), so others
+        # can tell when their lookups over old values are stale
+        self.generation = 0
+
     @classmethod
     def prelogin(cls):
         # make an instance of the pre-login settings (ie. w/o key)
@@ -325,6 +329,7 @@ class SettingsObject:
         # and pick the newest one (in unlikely case of dups)
         # reset
         self.current.clear()
+        self.generation += 1
         self.my_pos = None
         self.is_dirty = 0
         nonempty = set()
@@ -491,6 +496,7 @@ class SettingsObject:
 
         # act blank too, just in case.
         self.current.clear()
+        self.generation += 1
         self.is_dirty = 0
 
     @staticmethod
@@ -176,6 +176,43 @@ class Base64Writer:
             # library puts in a newline, remove it
             self.fd.write(tmp[:-1])
 
+class BlockWriter:
+    # Emulate a file/stream but collect small writes into whole blocks
+    # before passing them along; also sha256 over everything written
+    def __init__(self, fd, size=4096):
+        self.fd = fd
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.used = 0
+        self.checksum = sha256()
+
+    def __enter__(self):
+        self.fd.__enter__()
+        return self
+
+    def __exit__(self, *a, **k):
+        self.flush()
+        return self.fd.__exit__(*a, **k)
+
+    def flush(self):
+        if self.used:
+            self.fd.write(self.mv[0:self.used])
+            self.used = 0
+
+    def write(self, b):
+        self.checksum.update(b)
+
+        b = memoryview(b)
+        size = len(self.buf)
+        pos = 0
+        while pos < len(b):
+            here = min(size - self.used, len(b) - pos)
+            self.mv[self.used:self.used+here] = b[pos:pos+here]
+            self.used += here
+            pos += here
+            if self.used == size:
+                self.flush()
+
 def b2a_base64url(s):
     # see <https://datatracker.ietf.org/doc/html/rfc4648#section-5>
     return b2a_base64(s).rstrip(b'=\n').replace(b'+', b'-').replace(b'/', b'_').decode()
@@ -549,14 +586,24 @@ def parse_extended_key(ln, private=False):
     return node, chain, addr_fmt
 
 def chunk_writer(fd, body):
+    # write body in a few chunks, with progress bar
+    # - fd must be binary mode; returns sha256 digest over what was written
+    # - text is encoded one chunk at a time, bytes are written as-is
     from glob import dis
     dis.fullscreen("Saving...")
+    h = sha256()
+    is_text = isinstance(body, str)
     body_len = len(body)
     chunk = body_len // 10
     for idx, i in enumerate(range(0, body_len, chunk)):
-        fd.write(body[i:i + chunk])
+        part = body[i:i + chunk]
+        if is_text:
+            part = part.encode()
+        fd.write(part)
+        h.update(part)
         dis.progress_bar_show(idx / 10)
     dis.progress_bar_show(1)
+    return h.digest()
 
 
 def addr_fmt_label(addr_fmt):
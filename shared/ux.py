@@ -38,7 +38,11 @@ class UserInteraction:
         self.stack = []
 
     def top_of_stack(self):
-        return self.stack[-1] if self.stack else None
+        # checked by menu loop on every key; stack is almost never empty
+        try:
+            return self.stack[-1]
+        except IndexError:
+            return None
 
     def reset(self, new_ux):
         self.stack.clear()
@@ -167,6 +171,19 @@ def ux_poll_key():
 
     return ch
 
+# ux_show_story() scrolling keys: key => fn(top, num_lines) giving new top line
+_PG_UP = lambda top, n: max(0, top-STORY_H)
+_PG_DN = lambda top, n: min(n-2, top+STORY_H)
+_STORY_NAV = {
+    KEY_END: lambda top, n: max(0, n-(STORY_H//2)),
+    '0': lambda top, n: 0,
+    KEY_HOME: lambda top, n: 0,
+    '7': _PG_UP, KEY_PAGE_UP: _PG_UP, KEY_UP: _PG_UP,
+    '9': _PG_DN, KEY_PAGE_DOWN: _PG_DN, KEY_DOWN: _PG_DN,
+    # line up/down only on Mk4; too slow w/ Q1's big screen
+    '5': lambda top, n: max(0, top-1),
+    '8': lambda top, n: min(n-2, top+1),
+}
 
 async def ux_show_story(msg, title=None, escape=None, sensitive=False,
                         strict_escape=False, scrollbar=True, hint_icons=None):
@@ -204,17 +221,23 @@ async def ux_show_story(msg, title=None, escape=None, sensitive=False,
             lines.extend(word_wrap(ln, CH_PER_W))
 
     # trim blank lines at end, add our own marker
-    while not lines[-1]:
-        lines = lines[:-1]
+    end = len(lines)
+    while end and not lines[end-1]:
+        end -= 1
+    del lines[end:]
 
     lines.append('EOT')
+    num_lines = len(lines)          # fixed from here on
 
     top = 0
     ch = None
     pr = PressRelease()
+    view_top, view = None, None
     while 1:
-        # redraw
-        dis.draw_story(lines[top:top+STORY_H], top, len(lines), sensitive, hint_icons=hint_icons)
+        # redraw; visible lines only re-sliced after scrolling
+        if view_top != top:
+            view_top, view = top, lines[top:top+STORY_H]
+        dis.draw_story(view, top, num_lines, sensitive, hint_icons=hint_icons)
 
         # wait to do something
         ch = await pr.wait()
@@ -230,21 +253,11 @@ async def ux_show_story(msg, title=None, escape=None, sensitive=False,
         elif ch in 'xy':
             if not strict_escape:
                 return ch
-        elif ch == KEY_END:
-            top = max(0, len(lines)-(STORY_H//2))
-        elif ch == '0' or ch == KEY_HOME:
-            top = 0
-        elif ch == '7' or ch == KEY_PAGE_UP or ch == KEY_UP:
-            top = max(0, top-STORY_H)
-        elif ch == '9' or ch == KEY_PAGE_DOWN or ch == KEY_DOWN:
-            top = min(len(lines)-2, top+STORY_H)
-        elif ch == '5':
-            # line up/down only on Mk4; too slow w/ Q1's big screen
-            top = max(0, top-1)
-        elif ch == '8':
-            top = min(len(lines)-2, top+1)
-        elif not strict_escape:
-            if ch in { KEY_NFC, KEY_QR }:
+        else:
+            nav = _STORY_NAV.get(ch)
+            if nav:
+                top = nav(top, num_lines)
+            elif not strict_escape and (ch == KEY_NFC or ch == KEY_QR):
                 return ch
 
         
@@ -305,11 +318,13 @@ def restore_menu():
     # redraw screen contents after distrupting it w/ non-ux things (usb upload)
     m = the_ux.top_of_stack()
 
-    if hasattr(m, 'update_contents'):
-        m.update_contents()
+    fn = getattr(m, 'update_contents', None)
+    if fn:
+        fn()
 
-    if hasattr(m, 'show'):
-        m.show()
+    fn = getattr(m, 'show', None)
+    if fn:
+        fn()
 
 def abort_and_goto(m):
     # cancel any menu drill-down and show them some UX
@@ -345,37 +360,38 @@ def _import_prompt_builder(title, no_qr, no_nfc, slot_b_only=False):
     from version import has_qwerty, num_sd_slots, has_qr
     from glob import NFC, VD
 
-    prompt, escape = None, KEY_CANCEL+"x"
+    # prompt is built as comma-separated parts; escape as list of keys
+    prompt, escape = None, [KEY_CANCEL, "x"]
 
     if (NFC or VD) or num_sd_slots>1:
         if slot_b_only and (num_sd_slots>1):
-            prompt = "Press (B) to import %s from lower slot SD Card" % title
-            escape += "b"
+            parts = ["Press (B) to import %s from lower slot SD Card" % title]
+            escape.append("b")
         else:
-            prompt = "Press (1) to import %s from SD Card" % title
-            escape += "1"
+            parts = ["Press (1) to import %s from SD Card" % title]
+            escape.append("1")
             if num_sd_slots == 2:
-                prompt += ", (B) for lower slot"
-                escape += "ab"
+                parts.append("(B) for lower slot")
+                escape.append("ab")
 
         if VD is not None:
-            prompt += ", press (2) to import from Virtual Disk"
-            escape += "2"
+            parts.append("press (2) to import from Virtual Disk")
+            escape.append("2")
         if (NFC is not None) and not no_nfc:
             if has_qwerty:
-                prompt += ", press " + KEY_NFC + " to import via NFC"
-                escape += KEY_NFC
+                parts.append("press " + KEY_NFC + " to import via NFC")
+                escape.append(KEY_NFC)
             else:
-                prompt += ", press (3) to import via NFC"
-                escape += "3"
+                parts.append("press (3) to import via NFC")
+                escape.append("3")
 
         if has_qwerty and not no_qr:
-            prompt += ", " + KEY_QR + " to scan QR code"
-            escape += KEY_QR
+            parts.append(KEY_QR + " to scan QR code")
+            escape.append(KEY_QR)
 
-        prompt += "."
+        prompt = ", ".join(parts) + "."
 
-    return prompt, escape
+    return prompt, "".join(escape)
 
 
 def export_prompt_builder(what_it_is, no_qr=False, no_nfc=False, key0=None):
@@ -384,75 +400,79 @@ def export_prompt_builder(what_it_is, no_qr=False, no_nfc=False, key0=None):
     from version import has_qwerty, num_sd_slots, has_qr
     from glob import NFC, VD
 
-    prompt, escape = None, KEY_CANCEL+"x"
+    # prompt is built as comma-separated parts; escape as list of keys
+    prompt, escape = None, [KEY_CANCEL, "x"]
 
     if (NFC or VD) or (num_sd_slots>1) or key0:
         # no need to spam with another prompt, only option is SD card
 
-        prompt = "Press (1) to save %s to SD Card" % what_it_is
-        escape += "1"
+        parts = ["Press (1) to save %s to SD Card" % what_it_is]
+        escape.append("1")
         if num_sd_slots == 2:
             # MAYBE: show this only if both slots have cards inserted?
-            prompt += ", (B) for lower slot"
-            escape += "ab"
+            parts.append("(B) for lower slot")
+            escape.append("ab")
 
         if VD is not None:
-            prompt += ", press (2) to save to Virtual Disk"
-            escape += "2"
+            parts.append("press (2) to save to Virtual Disk")
+            escape.append("2")
 
         if (NFC is not None) and not no_nfc:
             if has_qwerty:
-                prompt += ", press " + KEY_NFC + " to share via NFC"
-                escape += KEY_NFC
+                parts.append("press " + KEY_NFC + " to share via NFC")
+                escape.append(KEY_NFC)
             else:
-                prompt += ", press (3) to share via NFC"
-                escape += "3"
+                parts.append("press (3) to share via NFC")
+                escape.append("3")
 
         if not no_qr:
             if has_qwerty:
-                prompt += ", "+KEY_QR+" to show QR code"
-                escape += KEY_QR
+                parts.append(KEY_QR + " to show QR code")
+                escape.append(KEY_QR)
             else:
-                prompt += ", (4) to show QR code"
-                escape += '4'
+                parts.append("(4) to show QR code")
+                escape.append('4')
 
         if key0:
-            prompt += ', (0) ' + key0
-            escape += '0'
+            parts.append('(0) ' + key0)
+            escape.append('0')
+
+        prompt = ", ".join(parts) + "."
 
-        prompt += "."
+    return prompt, "".join(escape)
 
-    return prompt, escape
+# import_export_prompt_decode(): keys that pick a non-file source, or cancel
+_PROMPT_SOURCES = {
+    '3': KEY_NFC, KEY_NFC: KEY_NFC,
+    '4': KEY_QR, KEY_QR: KEY_QR,
+    'x': KEY_CANCEL,
+}
+
+# ... and keys that pick a file: (force_vdisk, slot_b); slot_b=None => don't care / either
+_PROMPT_FILE_ARGS = {
+    '1': (False, None),
+    '2': (True, None),
+    'b': (False, True),
+    'a': (False, False),     # not documented on-screen? easter egg really. forces slot A if both in use.
+}
 
 def import_export_prompt_decode(ch):
     # We showed a prompt from _import_prompt_builder() and now need to 
     # figure out what they want to do.
     # - illegal choices should have been already blocked by "escape" on ux_story
 
-    force_vdisk = False
-    slot_b = None       # ie. don't care / either
-
-    if ch in "3"+KEY_NFC:
-        return KEY_NFC
-    elif ch in "4"+ KEY_QR:
-        return KEY_QR
-    elif ch == "2":
-        force_vdisk = True
-    elif ch == 'b':
-        slot_b = True
-    elif ch == 'a':
-        # not documented on-screen? easter egg really. forces slot A if both in use.
-        slot_b = False
-    elif ch == '1':
-        slot_b = None
-    elif ch == 'x':
-        return KEY_CANCEL
-    else:
+    rv = _PROMPT_SOURCES.get(ch)
+    if rv:
+        return rv
+
+    args = _PROMPT_FILE_ARGS.get(ch)
+    if not args:
         # Includes: '0': special "other" case
         # - cancel, enter, etc
         return ch
 
     # return extra arguments to files.file_picker() or CardSlot()
+    force_vdisk, slot_b = args
     return dict(force_vdisk=force_vdisk, slot_b=slot_b)
 
 async def import_export_prompt(what_it_is, is_import=False, no_qr=False,
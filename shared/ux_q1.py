@@ -839,14 +839,18 @@ class QRScannerInteraction:
         def convertor(got):
             file_type, _, data = decode_qr_result(got, expect_bbqr=True)
             if file_type == 'U':
+                # might be JSON anyway; keep BBQr data as bytes, plain QR gives str
                 data = data.strip()
-                if data[0] == '{' and data[-1] == '}':
+                is_str = isinstance(data, str)
+                if data.startswith('{' if is_str else b'{') \
+                        and data.endswith('}' if is_str else b'}'):
                     file_type = 'J'
             if file_type != 'J':
                 raise QRDecodeExplained('Expected JSON data')
             try:
-                import json
-                return json.loads(data)
+                # ujson as elsewhere; takes the BBQr bytes directly, no decode needed
+                import ujson
+                return ujson.loads(data)
             except:
                 raise QRDecodeExplained('Unable to decode JSON data')
             
@@ -0,0 +1,56 @@
+# (c) Copyright 2024 by Coinkite Inc. This file is covered by license found in COPYING-CC.
+#
+# unit test for BlockWriter in shared/utils.py
+#
+# this will run on the simulator
+# run manually with:
+#   execfile('../../testing/devtest/unit_blockwriter.py')
+#
+import uos
+from uhashlib import sha256
+from utils import BlockWriter
+
+fname = 'blockwriter.tmp'
+
+def readback():
+    with open(fname, 'rb') as fd:
+        return fd.read()
+
+# more than 4096 bytes, in uneven pieces, ending on a partial block
+whole = bytes((i * 7) & 0xff for i in range((4096 * 2) + 123))
+sizes = [1, 17, 333, 4095, 2, 4096, 1000]
+
+with BlockWriter(open(fname, 'wb')) as fd:
+    pos = n = 0
+    while pos < len(whole):
+        here = sizes[n % len(sizes)]
+        fd.write(whole[pos:pos+here])
+        pos += here
+        n += 1
+
+    # only whole blocks passed along so far
+    assert fd.fd.tell() == 4096 * 2, fd.fd.tell()
+    assert fd.used == 123
+
+# final partial block is written on exit
+assert fd.used == 0
+assert readback() == whole
+assert fd.checksum.digest() == sha256(whole).digest()
+
+# less than a block: all of it waits until exit
+with BlockWriter(open(fname, 'wb')) as fd:
+    fd.write(b'hello ')
+    fd.write(bytearray(b'world'))
+    assert fd.fd.tell() == 0
+
+assert readback() == b'hello world'
+assert fd.checksum.digest() == sha256(b'hello world').digest()
+
+# exactly whole blocks: nothing left over
+with BlockWriter(open(fname, 'wb')) as fd:
+    fd.write(whole[0:4096*2])
+    assert fd.used == 0
+
+assert readback() == whole[0:4096*2]
+
+uos.remove(fname)
@@ -0,0 +1,67 @@
+# (c) Copyright 2024 by Coinkite Inc. This file is covered by license found in COPYING-CC.
+#
+# unit test for stream_parts() in shared/export.py
+#
+# this will run on the simulator
+# run manually with:
+#   execfile('../../testing/devtest/unit_export_stream.py')
+#
+from export import stream_parts
+from utils import BlockWriter
+
+class FailingFile:
+    # file that fails after the first block, like card full or removed
+    def __init__(self):
+        self.writes = 0
+    def __enter__(self):
+        return self
+    def __exit__(self, *a):
+        return False
+    def write(self, b):
+        self.writes += 1
+        if self.writes > 1:
+            raise OSError(28)
+
+class GoodFile(FailingFile):
+    def write(self, b):
+        self.writes += 1
+
+class Secrets:
+    # stands in for stash.SensitiveValues: must be exited on every path
+    def __init__(self, log):
+        self.log = log
+    def __enter__(self):
+        self.log.append('enter')
+        return self
+    def __exit__(self, *a):
+        self.log.append('exit')
+        return False
+
+def make_parts(log, count, fail_at=None):
+    with Secrets(log):
+        for i in range(count):
+            if i == fail_at:
+                raise ValueError('gen failed')
+            yield 'x' * 1000
+
+# write fails part way: error raised, generator still closed
+log = []
+try:
+    stream_parts(BlockWriter(FailingFile()), make_parts(log, 100))
+    assert False, 'write should fail'
+except OSError:
+    pass
+assert log == ['enter', 'exit'], log
+
+# generator fails: error returned, not raised
+log = []
+err = stream_parts(BlockWriter(GoodFile()), make_parts(log, 100, fail_at=3))
+assert isinstance(err, ValueError), err
+assert log == ['enter', 'exit'], log
+
+# normal case
+log = []
+fd = BlockWriter(GoodFile())
+assert stream_parts(fd, make_parts(log, 10)) is None
+assert log == ['enter', 'exit'], log
+assert fd.used == 10000 % 4096
@@ -1056,6 +1056,43 @@ def test_import_dup_diff_xpub(N, clear_ms, make_multisig, offer_ms_import,
 
     clear_ms()
 
+@pytest.mark.parametrize('N', [ 3, 5])
+def test_import_dup_reordered(N, clear_ms, make_multisig, offer_ms_import,
+                              press_select, press_cancel):
+    # import wallet, then same again w/ cosigners in another order: not an xpub change
+    clear_ms()
+
+    M = N - 1
+    keys = make_multisig(M, N)
+
+    # render as a file for import
+    def make_named(name, order):
+        config = f"name: {name}\npolicy: {M} / {N}\nformat: p2wsh\n\n"
+        config += '\n'.join('%s: %s' % (xfp2str(xfp), sk.hwif(as_private=False))
+                                        for xfp,m,sk in order)
+        return config
+
+    title, story = offer_ms_import(make_named('xxx-orig', keys))
+    assert 'Create new multisig wallet' in story
+    press_select()
+
+    for order in [keys[::-1], keys[1:] + keys[:1]]:
+        # same name: exact duplicate
+        title, story = offer_ms_import(make_named('xxx-orig', order))
+        assert 'Duplicate wallet. All details are the same as existing!' in story
+        assert 'WARNING:' not in story
+        assert 'xpubs' not in story
+        press_cancel()
+
+        # other name: rename only
+        title, story = offer_ms_import(make_named('xxx-new', order))
+        assert 'Update NAME only of existing multisig wallet?' in story
+        assert 'WARNING:' not in story
+        assert 'xxx-new' in story
+        press_cancel()
+
+    clear_ms()
+
 
 @pytest.mark.bitcoind
 @pytest.mark.parametrize('m_of_n', [(2,2), (2,3), (15,15)])
@@ -1590,6 +1627,83 @@ def test_make_airgapped(addr_fmt, acct_num, N, goto_home, cap_story, pick_menu_i
     press_cancel()
 
 
+def test_make_airgapped_dup_file(goto_home, cap_story, pick_menu_item, need_keypress,
+                                 microsd_path, set_bip39_pw, clear_ms, get_settings,
+                                 load_export, press_select):
+    # same ccxp file on card twice (ie. double-tapped export): key counted once
+    from glob import glob
+    for fn in glob(microsd_path('ccxp-*.json')):
+        os.unlink(fn)
+    clear_ms()
+
+    # two co-signers, besides ourselves
+    for idx in [1, 2]:
+        set_bip39_pw(f'test {idx}')
+
+        goto_home()
+        time.sleep(0.1)
+        pick_menu_item('Settings')
+        pick_menu_item('Multisig Wallets')
+        pick_menu_item('Export XPUB')
+        time.sleep(.05)
+        press_select()
+
+        # account number zero
+        time.sleep(.05)
+        need_keypress('0')
+        press_select()
+
+        need_keypress('1')
+
+    set_bip39_pw('')
+
+    files = glob(microsd_path('ccxp-*.json'))
+    assert len(files) == 2
+    expect_xfps = set(json.load(open(fn))['xfp'] for fn in files)
+    expect_xfps.add(xfp2str(simulator_fixed_xfp))
+
+    # same content, other name
+    shutil.copy(files[0], files[0].replace('ccxp-', 'ccxp-copy-'))
+
+    goto_home()
+    pick_menu_item('Settings')
+    pick_menu_item('Multisig Wallets')
+    pick_menu_item('Create Airgapped')
+    time.sleep(.1)
+    title, story = cap_story()
+    assert 'XPUB' in story
+    press_select()          # p2wsh
+
+    time.sleep(.1)
+    title, story = cap_story()
+    assert '(N=3 #files=3' in story
+    assert '2 of 3' in story
+    press_select()
+
+    time.sleep(.1)
+    title, story = cap_story()
+    assert "Create new multisig" in story
+    assert "Policy: 2 of 3" in story
+    press_select()
+
+    impf = load_export("sd", label="Coldcard multisig setup", is_json=False, sig_check=False,
+                       tail_check="Import that file onto the other Coldcards involved with this multisig wallet")
+    assert 'Policy: 2 of 3' in impf
+    load_export("sd", is_json=True, label="Electrum multisig wallet", sig_check=False)
+    press_select()
+    press_select()
+
+    # saved wallet has each key once
+    name, (M, N), xpubs, opts = get_settings()['multisig'][0]
+    assert (M, N) == (2, 3)
+    assert len(xpubs) == 3
+    assert set(xfp2str(xp[0]) for xp in xpubs) == expect_xfps
+    assert len(set(xp[-1] for xp in xpubs)) == 3
+
+    for fn in glob(microsd_path('ccxp-*.json')):
+        os.unlink(fn)
+    clear_ms()
+
 @pytest.mark.unfinalized
 @pytest.mark.bitcoind
 @pytest.mark.parametrize('addr_style', ["legacy", "p2sh-segwit", "bech32"])
@@ -482,6 +482,53 @@ def test_top_import(goto_notes, cap_menu, cap_story, need_keypress, settings_get
     assert settings_get('notes', 'MISSING') == notes
     goto_notes()
 
+@pytest.mark.parametrize('way', ['J', 'U', 'plain'])
+def test_import_qr_json(way, goto_notes, need_keypress, settings_get, settings_set,
+                        scan_a_qr):
+    # JSON accepted as BBQr of JSON or text type, or just a plain QR
+    notes = [dict(misc='Body', title='Title Here')]
+    settings_set('notes', [])
+
+    goto_notes('Import')
+    need_keypress(KEY_QR)
+
+    jj = json.dumps(dict(coldcard_notes=notes))
+    if way == 'plain':
+        scan_a_qr(jj)
+    else:
+        _, parts = split_qrs(jj, way, max_version=20)
+        for p in parts:
+            scan_a_qr(p)
+
+    for _ in range(10):
+        time.sleep(.2)
+        got = settings_get('notes', [])
+        if got: break
+
+    assert got == notes
+    goto_notes()
+
+@pytest.mark.parametrize('qr, problem', [
+    ('hello world', 'Expected JSON data'),
+    ('{not json', 'Expected JSON data'),
+    ('{not json}', 'Unable to decode JSON data'),
+])
+def test_import_qr_not_json(qr, problem, goto_notes, need_keypress, cap_screen,
+                            settings_get, settings_set, scan_a_qr, press_cancel):
+    # text that isn't JSON: explained on scan screen, keeps scanning
+    settings_set('notes', [])
+
+    goto_notes('Import')
+    need_keypress(KEY_QR)
+
+    scan_a_qr(qr)
+    time.sleep(.5)
+    assert problem in cap_screen()
+
+    press_cancel()
+    assert settings_get('notes', []) == []
+    goto_notes()
+
 
 @pytest.mark.parametrize('qr,title', [
     ('otpauth://totp/ACME%20Co:john.doe@email.com?secret=HXDMVJECJJWSRB3HWIZR4IFUGFTMXBOZ&issuer=ACME%20Co&algorithm=SHA1&digits=6&period=30',
@@ -139,6 +139,14 @@ def test_decoding(unit_test):
     # utils.py Hex/Base64 streaming decoders
     unit_test('devtest/unit_decoding.py')
 
+def test_blockwriter(unit_test):
+    # utils.py BlockWriter: whole-block writes and checksum
+    unit_test('devtest/unit_blockwriter.py')
+
+def test_export_stream(unit_test):
+    # export.py stream_parts: generator closed even if write fails
+    unit_test('devtest/unit_export_stream.py')
+
 @pytest.mark.parametrize('hasher', ['sha256', 'sha1', 'sha512'])
 @pytest.mark.parametrize('msg', [b'123', b'b'*78])
 @pytest.mark.parametrize('key', [b'3245', b'b'*78])
@@ -255,6 +263,27 @@ def test_match_deriv_path(patterns, paths, answers, sim_exec):
         rv = sim_exec(cmd)
         assert rv == str(bool(ans))
 
+@pytest.mark.parametrize('value, ans', [
+    ("2of3", (2, 3)),
+    ("2 of 3", (2, 3)),
+    ("2-of-3", (2, 3)),
+    ("2OF3", (2, 3)),
+    ("2/3", (2, 3)),
+    ("  2 \t of  3  ", (2, 3)),
+    ("23", (2, 3)),
+    ("15 of 15", (15, 15)),
+])
+def test_parse_m_of_n_good(value, ans, sim_exec):
+    cmd = f'from multisig import parse_m_of_n; RV.write(repr(parse_m_of_n({value!r})))'
+    rv = sim_exec(cmd)
+    assert 'Traceback' not in rv, rv
+    assert eval(rv) == ans
+
+@pytest.mark.parametrize('value', [ "of3", "2of", "0of0", "16of15", "3of2", "", "of" ])
+def test_parse_m_of_n_fails(value, sim_exec):
+    cmd = f'from multisig import parse_m_of_n; RV.write(repr(parse_m_of_n({value!r})))'
+    rv = sim_exec(cmd)
+    assert 'Traceback' in rv
 
 def test_is_dir(microsd_path, sim_exec):
     dir = microsd_path("my_dir/my_inner_dir")